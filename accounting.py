@@ -6,10 +6,19 @@ from dataclasses import dataclass
 from datetime import date
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
 
+_DUMMY_TRIAL_BALANCE = pd.DataFrame(
+    {
+        "勘定科目": ["売上高", "売上原価", "販管費", "営業外収益", "当期純利益"],
+        "金額": np.array([12_500_000, -5_300_000, -4_800_000, 300_000, 2_700_000], dtype=np.int64),
+    }
+)
+
+
 @dataclass
 class AccountingConfig:
     """Configuration placeholder for connecting to accounting SaaS."""
@@ -41,25 +50,18 @@ class AccountingConnector:
 
         if self.token is None:
             self.authenticate()
-        data = [
-            {"勘定科目": "売上高", "金額": 12_500_000},
-            {"勘定科目": "売上原価", "金額": -5_300_000},
-            {"勘定科目": "販管費", "金額": -4_800_000},
-            {"勘定科目": "営業外収益", "金額": 300_000},
-            {"勘定科目": "当期純利益", "金額": 2_700_000},
-        ]
-        return pd.DataFrame(data)
+        return _DUMMY_TRIAL_BALANCE.copy()
 
     def fetch_cash_balance(self) -> pd.DataFrame:
         """Simulate cash balance transitions for dashboard visuals."""
 
         months = pd.date_range(date.today().replace(day=1), periods=6, freq="M")
-        balance = 8_000_000
-        rows = []
-        for month in months:
-            balance += 500_000
-            rows.append({"月": month.date(), "現金預金残高": balance})
-        return pd.DataFrame(rows)
+        return pd.DataFrame(
+            {
+                "月": months.date,
+                "現金預金残高": 8_000_000 + 500_000 * np.arange(1, len(months) + 1),
+            }
+        )
 
 
 def render_accounting_preview(connector: AccountingConnector) -> None:
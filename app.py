@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import Dict, Iterable, Tuple
+from typing import Any, Callable, Dict, Iterable, Tuple
 
 import pandas as pd
 import streamlit as st
@@ -9,17 +9,19 @@ import streamlit as st
 from accounting import AccountingConfig, AccountingConnector, render_accounting_preview
 from export import export_plan_to_excel, export_plan_to_pdf, export_plan_to_ppt
 from forecast import render_forecast_section
-from milestones import render_milestone_manager
+from milestones import COLUMNS as MILESTONE_COLUMNS, EMPTY_MILESTONES, render_milestone_manager
 from onboarding import show_onboarding_tour
 from styles import inject_custom_style, section_header
 from utils import (
     FinancialInputs,
-    calc_cashflow_projection,
-    calc_income_statement,
+    cached_cashflow_projection,
+    cached_financial_narrative,
+    cached_income_statement,
     format_currency,
     format_percentage,
-    generate_financial_narrative,
+    frame_digest,
     initialize_session_state,
+    plan_digest,
     plan_to_financial_inputs,
     save_encrypted_payload,
     validate_required_fields,
@@ -38,6 +40,153 @@ NAVIGATION_OPTIONS = [
     "進捗ダッシュボード",
 ]
 
+# (plan key, label, default, NumberColumn options) for the financial input editor.
+FINANCIAL_FIELDS: Tuple[Tuple[str, str, float, Dict[str, Any]], ...] = (
+    (
+        "sales",
+        "年間売上高",
+        0.0,
+        {"min_value": 0.0, "step": 1_000_000.0, "format": "localized", "help": "想定する年間売上高（税抜）。"},
+    ),
+    (
+        "cogs_rate",
+        "売上原価率",
+        0.0,
+        {"min_value": 0.0, "max_value": 1.0, "step": 0.01, "format": "%.2f", "help": "材料費・外注費など変動費の割合。"},
+    ),
+    (
+        "personnel_cost",
+        "人件費",
+        0.0,
+        {"min_value": 0.0, "step": 500_000.0, "format": "localized", "help": "給与・賞与・社会保険料など。"},
+    ),
+    (
+        "marketing_cost",
+        "マーケティング費",
+        0.0,
+        {"min_value": 0.0, "step": 200_000.0, "format": "localized", "help": "広告宣伝や展示会費用。"},
+    ),
+    (
+        "general_admin_cost",
+        "一般管理費",
+        0.0,
+        {"min_value": 0.0, "step": 200_000.0, "format": "localized", "help": "家賃・水道光熱・システム費など固定費。"},
+    ),
+    (
+        "depreciation",
+        "減価償却費",
+        0.0,
+        {"min_value": 0.0, "step": 100_000.0, "format": "localized", "help": "設備・システム投資の償却費。"},
+    ),
+    (
+        "other_income",
+        "営業外収益",
+        0.0,
+        {"min_value": 0.0, "step": 100_000.0, "format": "localized", "help": "補助金・助成金などの収益。"},
+    ),
+    (
+        "interest_payment",
+        "支払利息",
+        0.0,
+        {"min_value": 0.0, "step": 50_000.0, "format": "localized", "help": "借入金の利息支払い。"},
+    ),
+    (
+        "tax_rate",
+        "実効税率",
+        0.3,
+        {"min_value": 0.0, "max_value": 0.6, "step": 0.01, "format": "%.2f", "help": "法人税等の実効税率。"},
+    ),
+    (
+        "initial_cash",
+        "期首現金",
+        0.0,
+        {"min_value": 0.0, "step": 500_000.0, "format": "localized", "help": "期首の現預金残高。"},
+    ),
+    (
+        "capital_expenditure",
+        "設備投資",
+        0.0,
+        {"min_value": 0.0, "step": 500_000.0, "format": "localized", "help": "今年予定している投資額。"},
+    ),
+    (
+        "fiscal_year",
+        "対象年度",
+        2024,
+        {"min_value": 2020, "max_value": 2100, "step": 1, "format": "%d", "help": "計画対象となる会計年度。"},
+    ),
+)
+
+FINANCIAL_KEYS = frozenset({"financial_inputs", "income_statement", "summary", "narrative", "cashflow_df"})
+
+
+@st.cache_resource
+def _accounting_connector(provider: str) -> AccountingConnector:
+    return AccountingConnector(AccountingConfig(provider=provider))
+
+
+# Arguments prefixed with an underscore are skipped by Streamlit's hasher; the
+# digests passed alongside them act as the cache key.
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_excel(
+    plan_key: str,
+    is_key: str,
+    fc_key: str,
+    ms_key: str,
+    _plan_data: Dict,
+    _income_statement: pd.DataFrame,
+    _forecast_df: pd.DataFrame,
+    _milestones_df: pd.DataFrame,
+) -> bytes:
+    return export_plan_to_excel(_plan_data, _income_statement, _forecast_df, _milestones_df)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_pdf(
+    plan_key: str, narrative: str, is_key: str, _plan_data: Dict, _income_statement: pd.DataFrame
+) -> bytes:
+    return export_plan_to_pdf(_plan_data, narrative, _income_statement)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_ppt(
+    plan_key: str, narrative: str, is_key: str, _plan_data: Dict, _income_statement: pd.DataFrame
+) -> bytes:
+    return export_plan_to_ppt(_plan_data, narrative, _income_statement)
+
+
+def _export_blob(fmt: str, cache_key: Tuple[str, ...], build: Callable[[], bytes]) -> bytes:
+    blobs = st.session_state.setdefault("export_blobs", {})
+    cached = blobs.get(fmt)
+    if cached is None or cached[0] != cache_key:
+        cached = blobs[fmt] = (cache_key, build())
+    return cached[1]
+
+
+def _compute_financials(
+    plan_data: Dict,
+) -> Tuple[FinancialInputs, pd.DataFrame, Dict[str, float], str, pd.DataFrame]:
+    financial_inputs = plan_to_financial_inputs(plan_data)
+    income_statement = pd.DataFrame()
+    summary: Dict[str, float] = {}
+    narrative = ""
+    cashflow_df = pd.DataFrame()
+    try:
+        income_statement, summary = cached_income_statement(financial_inputs)
+        narrative = cached_financial_narrative(financial_inputs)
+        cashflow_df = cached_cashflow_projection(financial_inputs)
+    except ValueError as exc:
+        st.warning(str(exc))
+    return financial_inputs, income_statement, summary, narrative, cashflow_df
+
+
+def _milestones_frame() -> pd.DataFrame:
+    milestones_state = st.session_state.get("milestones")
+    if isinstance(milestones_state, pd.DataFrame):
+        return milestones_state
+    if not milestones_state:
+        return EMPTY_MILESTONES.copy()
+    return pd.DataFrame(milestones_state, columns=MILESTONE_COLUMNS)
+
 
 def process_actions(
     section_key: str,
@@ -59,21 +208,25 @@ def process_actions(
             st.error(message)
         return
 
-    st.session_state["plan_data"][section_key].update(new_values)
-    save_encrypted_payload(st.session_state["plan_data"])
+    plan_data = st.session_state["plan_data"]
+    plan_data[section_key].update(new_values)
+    try:
+        save_encrypted_payload(plan_data)
+    except OSError as exc:
+        st.error(f"保存に失敗しました: {exc}")
+        return
 
     if save_clicked:
         st.success("保存しました。")
-    if back_clicked and back_target:
-        st.session_state["navigation"] = back_target
-        st.experimental_rerun()
-    if next_clicked and next_target:
-        st.session_state["navigation"] = next_target
-        st.experimental_rerun()
+    target = back_target if back_clicked else next_target if next_clicked else None
+    if target and target != st.session_state.get("navigation"):
+        # The navigation radio is already instantiated, so the new page is
+        # applied by main() before the radio is built on the next run.
+        st.session_state["pending_navigation"] = target
+        st.rerun()
 
 
-def render_overview(income_statement: pd.DataFrame, narrative: str, forecast_df: pd.DataFrame) -> None:
-    section_header("Overview", "ビジョン・ミッションを整理し、戦略ストーリーの土台を固めます。")
+def _render_overview_form() -> None:
     overview = st.session_state["plan_data"]["overview"]
 
     with st.form("overview_form"):
@@ -133,46 +286,85 @@ def render_overview(income_statement: pd.DataFrame, narrative: str, forecast_df:
         next_target="3C分析",
     )
 
+
+def render_overview(
+    income_statement: pd.DataFrame, narrative: str, forecast_df: pd.DataFrame, plan_key: str
+) -> None:
+    section_header("Overview", "ビジョン・ミッションを整理し、戦略ストーリーの土台を固めます。")
+    _render_overview_form()
+
     if narrative:
         st.info(narrative)
     if not income_statement.empty:
         st.dataframe(income_statement, use_container_width=True)
 
-    milestones_state = st.session_state.get("milestones")
-    if isinstance(milestones_state, pd.DataFrame):
-        milestones_df = milestones_state.copy()
-    else:
-        milestones_df = pd.DataFrame(milestones_state or [])
-    if forecast_df.empty:
+    milestones_df = _milestones_frame()
+    chart_df = st.session_state.get("forecast_wide")
+    if forecast_df.empty or chart_df is None:
         st.caption("シナリオ分析を実行すると売上予測が表示されます。")
     else:
-        chart_df = forecast_df.pivot(index="月", columns="シナリオ", values="売上")
         st.line_chart(chart_df, use_container_width=True)
 
+    requested = st.session_state.setdefault("export_requested", set())
+    plan_data = st.session_state["plan_data"]
+    is_key = frame_digest(income_statement)
     col1, col2, col3 = st.columns(3)
-    excel_bytes = export_plan_to_excel(
-        st.session_state["plan_data"], income_statement, forecast_df, milestones_df
-    )
-    col1.download_button(
-        "Excel出力",
-        data=excel_bytes,
-        file_name="business_plan.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    pdf_bytes = export_plan_to_pdf(st.session_state["plan_data"], narrative, income_statement)
-    col2.download_button(
-        "PDF出力",
-        data=pdf_bytes,
-        file_name="business_plan.pdf",
-        mime="application/pdf",
-    )
-    ppt_bytes = export_plan_to_ppt(st.session_state["plan_data"], narrative, income_statement)
-    col3.download_button(
-        "PowerPoint出力",
-        data=ppt_bytes,
-        file_name="business_plan.pptx",
-        mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-    )
+    with col1:
+        if "xlsx" in requested or st.button("Excel出力を準備", use_container_width=True):
+            requested.add("xlsx")
+            fc_key = frame_digest(forecast_df)
+            ms_key = frame_digest(milestones_df)
+            excel_bytes = _export_blob(
+                "xlsx",
+                (plan_key, is_key, fc_key, ms_key),
+                lambda: _cached_excel(
+                    plan_key,
+                    is_key,
+                    fc_key,
+                    ms_key,
+                    plan_data,
+                    income_statement,
+                    forecast_df,
+                    milestones_df,
+                ),
+            )
+            st.download_button(
+                "Excel出力",
+                data=excel_bytes,
+                file_name="business_plan.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="xlsx_download",
+            )
+    with col2:
+        if "pdf" in requested or st.button("PDF出力を準備", use_container_width=True):
+            requested.add("pdf")
+            pdf_bytes = _export_blob(
+                "pdf",
+                (plan_key, narrative, is_key),
+                lambda: _cached_pdf(plan_key, narrative, is_key, plan_data, income_statement),
+            )
+            st.download_button(
+                "PDF出力",
+                data=pdf_bytes,
+                file_name="business_plan.pdf",
+                mime="application/pdf",
+                key="pdf_download",
+            )
+    with col3:
+        if "pptx" in requested or st.button("PowerPoint出力を準備", use_container_width=True):
+            requested.add("pptx")
+            ppt_bytes = _export_blob(
+                "pptx",
+                (plan_key, narrative, is_key),
+                lambda: _cached_ppt(plan_key, narrative, is_key, plan_data, income_statement),
+            )
+            st.download_button(
+                "PowerPoint出力",
+                data=ppt_bytes,
+                file_name="business_plan.pptx",
+                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                key="pptx_download",
+            )
 
 
 def render_three_c() -> None:
@@ -368,128 +560,40 @@ def render_four_p() -> None:
     )
 
 
-def render_financial_section(
-    financial_inputs: FinancialInputs,
-    income_statement: pd.DataFrame,
-    summary: Dict[str, float],
-    cashflow_df: pd.DataFrame,
-) -> None:
-    section_header("財務計画", "収益性とキャッシュを両面でマネジメントします。")
+def _render_financial_form() -> None:
     data = st.session_state["plan_data"]["financials"]
+    input_df = pd.DataFrame(
+        [{key: float(data.get(key, default)) for key, _, default, _ in FINANCIAL_FIELDS}]
+    ).astype({"fiscal_year": "int64"})
     with st.form("financial_form"):
-        col_left, col_right = st.columns(2)
-        with col_left:
-            sales = st.number_input(
-                "年間売上高",
-                value=float(data.get("sales", 0.0)),
-                min_value=0.0,
-                step=1_000_000.0,
-                help="想定する年間売上高（税抜）。",
-            )
-            cogs_rate = st.number_input(
-                "売上原価率",
-                value=float(data.get("cogs_rate", 0.0)),
-                min_value=0.0,
-                max_value=1.0,
-                step=0.01,
-                help="材料費・外注費など変動費の割合。",
-            )
-            personnel_cost = st.number_input(
-                "人件費",
-                value=float(data.get("personnel_cost", 0.0)),
-                min_value=0.0,
-                step=500_000.0,
-                help="給与・賞与・社会保険料など。",
-            )
-            marketing_cost = st.number_input(
-                "マーケティング費",
-                value=float(data.get("marketing_cost", 0.0)),
-                min_value=0.0,
-                step=200_000.0,
-                help="広告宣伝や展示会費用。",
-            )
-            general_admin_cost = st.number_input(
-                "一般管理費",
-                value=float(data.get("general_admin_cost", 0.0)),
-                min_value=0.0,
-                step=200_000.0,
-                help="家賃・水道光熱・システム費など固定費。",
-            )
-        with col_right:
-            depreciation = st.number_input(
-                "減価償却費",
-                value=float(data.get("depreciation", 0.0)),
-                min_value=0.0,
-                step=100_000.0,
-                help="設備・システム投資の償却費。",
-            )
-            other_income = st.number_input(
-                "営業外収益",
-                value=float(data.get("other_income", 0.0)),
-                min_value=0.0,
-                step=100_000.0,
-                help="補助金・助成金などの収益。",
-            )
-            interest_payment = st.number_input(
-                "支払利息",
-                value=float(data.get("interest_payment", 0.0)),
-                min_value=0.0,
-                step=50_000.0,
-                help="借入金の利息支払い。",
-            )
-            tax_rate = st.number_input(
-                "実効税率",
-                value=float(data.get("tax_rate", 0.3)),
-                min_value=0.0,
-                max_value=0.6,
-                step=0.01,
-                help="法人税等の実効税率。",
-            )
-            initial_cash = st.number_input(
-                "期首現金",
-                value=float(data.get("initial_cash", 0.0)),
-                min_value=0.0,
-                step=500_000.0,
-                help="期首の現預金残高。",
-            )
-            capital_expenditure = st.number_input(
-                "設備投資",
-                value=float(data.get("capital_expenditure", 0.0)),
-                min_value=0.0,
-                step=500_000.0,
-                help="今年予定している投資額。",
-            )
-        fiscal_year = st.number_input(
-            "対象年度",
-            value=int(data.get("fiscal_year", 2024)),
-            min_value=2020,
-            max_value=2100,
-            step=1,
-            help="計画対象となる会計年度。",
+        edited_df = st.data_editor(
+            input_df,
+            column_config={
+                key: st.column_config.NumberColumn(label, required=True, **options)
+                for key, label, _, options in FINANCIAL_FIELDS
+            },
+            hide_index=True,
+            num_rows="fixed",
+            use_container_width=True,
         )
         col_back, col_save, col_next = st.columns(3)
         back_clicked = col_back.form_submit_button("← 戻る", use_container_width=True)
         save_clicked = col_save.form_submit_button("💾 保存", use_container_width=True)
         next_clicked = col_next.form_submit_button("次へ →", use_container_width=True)
 
-    new_values = {
-        "sales": sales,
-        "cogs_rate": cogs_rate,
-        "personnel_cost": personnel_cost,
-        "marketing_cost": marketing_cost,
-        "general_admin_cost": general_admin_cost,
-        "depreciation": depreciation,
-        "other_income": other_income,
-        "interest_payment": interest_payment,
-        "tax_rate": tax_rate,
-        "initial_cash": initial_cash,
-        "capital_expenditure": capital_expenditure,
-        "fiscal_year": fiscal_year,
-    }
+    row = edited_df.iloc[0]
+    new_values = {}
+    for key, _, _, _ in FINANCIAL_FIELDS:
+        value = row[key]
+        if pd.isna(value):
+            new_values[key] = None
+        else:
+            new_values[key] = int(value) if key == "fiscal_year" else float(value)
+    # Cells of the editor can be cleared, so every field is validated.
     process_actions(
         "financials",
         new_values,
-        (("sales", "年間売上高"), ("cogs_rate", "売上原価率")),
+        tuple((key, label) for key, label, _, _ in FINANCIAL_FIELDS),
         back_clicked=back_clicked,
         save_clicked=save_clicked,
         next_clicked=next_clicked,
@@ -497,6 +601,16 @@ def render_financial_section(
         next_target="マイルストーン",
     )
 
+
+def render_financial_section(
+    financial_inputs: FinancialInputs,
+    income_statement: pd.DataFrame,
+    summary: Dict[str, float],
+    cashflow_df: pd.DataFrame,
+) -> None:
+    section_header("財務計画", "収益性とキャッシュを両面でマネジメントします。")
+    _render_financial_form()
+
     if income_statement.empty or not summary:
         st.warning("財務指標に異常値が含まれています。入力値をご確認ください。")
     else:
@@ -505,15 +619,19 @@ def render_financial_section(
         metrics[0].metric("営業利益率", format_percentage(summary["operating_margin"]))
         metrics[1].metric("経常利益率", format_percentage(summary["ordinary_margin"]))
         break_even = summary.get("break_even_sales")
-        if break_even is None or pd.isna(break_even):
+        if break_even is None or break_even != break_even:
             break_even = 0.0
         metrics[2].metric("損益分岐点売上高", format_currency(break_even))
         labor_ratio = summary.get("labor_distribution_ratio")
-        labor_ratio = 0 if labor_ratio is None or pd.isna(labor_ratio) else labor_ratio
+        labor_ratio = 0 if labor_ratio is None or labor_ratio != labor_ratio else labor_ratio
         metrics[3].metric("労働分配率", format_percentage(labor_ratio))
 
     forecast_df = render_forecast_section(financial_inputs)
-    st.session_state["forecast_df"] = forecast_df
+    if st.session_state.get("forecast_df") is not forecast_df:
+        st.session_state["forecast_df"] = forecast_df
+        st.session_state["forecast_wide"] = forecast_df.pivot(
+            index="月", columns="シナリオ", values="売上"
+        )
 
     if not cashflow_df.empty:
         st.line_chart(cashflow_df.set_index("月")["累計現金残高"], height=320)
@@ -532,7 +650,8 @@ def render_dashboard(
         return
 
     kpi_columns = st.columns(4)
-    kpi_columns[0].metric("売上高", format_currency(income_statement.loc[0, "金額"]))
+    sales = income_statement.iat[0, income_statement.columns.get_loc("金額")]
+    kpi_columns[0].metric("売上高", format_currency(sales))
     kpi_columns[1].metric("営業利益", format_currency(summary["operating_profit"]))
     kpi_columns[2].metric("当期純利益", format_currency(summary["net_income"]))
     kpi_columns[3].metric("営業利益率", format_percentage(summary["operating_margin"]))
@@ -546,16 +665,57 @@ def render_dashboard(
     else:
         st.caption("マイルストーン情報が未入力です。")
 
-    connector = AccountingConnector(AccountingConfig(provider="dummy"))
+    connector = _accounting_connector("dummy")
     render_accounting_preview(connector)
 
 
+# page -> (renderer, context keys the renderer needs).
+ROUTES: Dict[str, Tuple[Callable[..., Any], frozenset[str]]] = {
+    "概要": (render_overview, frozenset({"income_statement", "narrative", "forecast_df", "plan_key"})),
+    "3C分析": (render_three_c, frozenset()),
+    "SWOT分析": (render_swot, frozenset()),
+    "PEST分析": (render_pest, frozenset()),
+    "4P": (render_four_p, frozenset()),
+    "財務計画": (
+        render_financial_section,
+        frozenset({"financial_inputs", "income_statement", "summary", "cashflow_df"}),
+    ),
+    "マイルストーン": (render_milestone_manager, frozenset()),
+    "進捗ダッシュボード": (
+        render_dashboard,
+        frozenset({"income_statement", "summary", "cashflow_df", "forecast_df", "milestones_df"}),
+    ),
+}
+
+
+def _build_context(needs: frozenset[str]) -> Dict[str, Any]:
+    plan_data = st.session_state["plan_data"]
+    context: Dict[str, Any] = {}
+    if needs & FINANCIAL_KEYS:
+        (
+            context["financial_inputs"],
+            context["income_statement"],
+            context["summary"],
+            context["narrative"],
+            context["cashflow_df"],
+        ) = _compute_financials(plan_data)
+    if "plan_key" in needs:
+        context["plan_key"] = plan_digest(plan_data)
+    if "forecast_df" in needs:
+        context["forecast_df"] = st.session_state.get("forecast_df", pd.DataFrame())
+    if "milestones_df" in needs:
+        context["milestones_df"] = _milestones_frame()
+    return {key: context[key] for key in needs}
+
+
 def main() -> None:
     st.set_page_config(page_title="統合経営計画ダッシュボード", page_icon="📊", layout="wide")
     inject_custom_style()
     initialize_session_state()
     show_onboarding_tour()
 
+    if "pending_navigation" in st.session_state:
+        st.session_state["navigation"] = st.session_state.pop("pending_navigation")
     st.sidebar.title("ナビゲーション")
     nav = st.sidebar.radio("メニュー", NAVIGATION_OPTIONS, key="navigation")
     if st.sidebar.button("ウィザードを起動", use_container_width=True):
@@ -566,45 +726,8 @@ def main() -> None:
         run_plan_wizard()
         return
 
-    plan_data = st.session_state["plan_data"]
-    financial_inputs = plan_to_financial_inputs(plan_data)
-    income_statement = pd.DataFrame()
-    summary: Dict[str, float] = {}
-    narrative = ""
-    cashflow_df = pd.DataFrame()
-    try:
-        income_statement, summary = calc_income_statement(financial_inputs)
-        narrative = generate_financial_narrative(financial_inputs, summary)
-        cashflow_df = calc_cashflow_projection(financial_inputs)
-    except ValueError as exc:
-        st.warning(str(exc))
-
-    forecast_df = st.session_state.get("forecast_df", pd.DataFrame())
-    milestones_state = st.session_state.get("milestones")
-    if isinstance(milestones_state, pd.DataFrame):
-        milestones_df = milestones_state.copy()
-    else:
-        milestones_df = pd.DataFrame(
-            milestones_state or [],
-            columns=["マイルストーン", "予定日", "実績日", "担当者", "進捗率"],
-        )
-
-    if nav == "概要":
-        render_overview(income_statement, narrative, forecast_df)
-    elif nav == "3C分析":
-        render_three_c()
-    elif nav == "SWOT分析":
-        render_swot()
-    elif nav == "PEST分析":
-        render_pest()
-    elif nav == "4P":
-        render_four_p()
-    elif nav == "財務計画":
-        render_financial_section(financial_inputs, income_statement, summary, cashflow_df)
-    elif nav == "マイルストーン":
-        milestones_df = render_milestone_manager()
-    elif nav == "進捗ダッシュボード":
-        render_dashboard(income_statement, summary, cashflow_df, forecast_df, milestones_df)
+    render, needs = ROUTES[nav]
+    render(**_build_context(needs))
 
 
 if __name__ == "__main__":
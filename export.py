@@ -1,19 +1,74 @@
 """Export utilities for generating deliverables from plan data."""
 from __future__ import annotations
 
+from functools import lru_cache
+from importlib.util import find_spec
 from io import BytesIO
 from typing import Dict
 
+import numpy as np
 import pandas as pd
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.pdfgen import canvas
+from pandas.api.types import infer_dtype, is_numeric_dtype
 
 from utils import flatten_plan
 
+EXCEL_ENGINE = "xlsxwriter" if find_spec("xlsxwriter") is not None else "openpyxl"
+PDF_FONT = "HeiseiKakuGo-W5"
+
+
+def _header_format(writer: pd.ExcelWriter):
+    """Return an xlsxwriter format matching pandas' default header style."""
+
+    return writer.book.add_format({"bold": True, "border": 1, "align": "center"})
+
+
+def _write_plan_sheet(writer: pd.ExcelWriter, plan_data: Dict[str, Dict]) -> None:
+    """Write the flattened plan rows straight into the workbook."""
+
+    if EXCEL_ENGINE != "xlsxwriter":
+        flatten_plan(plan_data).to_excel(writer, sheet_name="Plan", index=False)
+        return
+    sheet = writer.book.add_worksheet("Plan")
+    sheet.write_row(0, 0, ("セクション", "項目", "内容"), _header_format(writer))
+    row = 1
+    for section, contents in plan_data.items():
+        items = contents.items() if isinstance(contents, dict) else (("value", contents),)
+        for key, value in items:
+            if isinstance(value, (list, tuple, dict)):
+                value = str(value)
+            elif isinstance(value, float) and not np.isfinite(value):
+                # Match pandas: NaN becomes a blank cell and infinities are spelled out.
+                value = None if value != value else ("inf" if value > 0 else "-inf")
+            sheet.write_row(row, 0, (section, key, value))
+            row += 1
+
+
+def _natively_writable(df: pd.DataFrame) -> bool:
+    """Return whether every column can go to xlsxwriter without pandas' conversion."""
+
+    for column in df.columns:
+        values = df[column]
+        if is_numeric_dtype(values):
+            # xlsxwriter rejects NaN/inf, which pandas renders as blanks or "inf".
+            if not np.isfinite(values.to_numpy(dtype=np.float64)).all():
+                return False
+        elif infer_dtype(values, skipna=False) != "string":
+            # Dates and mixed objects need pandas' cell formatting.
+            return False
+    return True
+
+
+def _write_frame_sheet(writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame) -> None:
+    """Write each column from its NumPy array in a single call when possible."""
+
+    if EXCEL_ENGINE != "xlsxwriter" or not _natively_writable(df):
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
+        return
+    sheet = writer.book.add_worksheet(sheet_name)
+    sheet.write_row(0, 0, df.columns.tolist(), _header_format(writer))
+    for col_idx, column in enumerate(df.columns):
+        sheet.write_column(1, col_idx, df[column].to_numpy())
+
 
 def export_plan_to_excel(
     plan_data: Dict[str, Dict],
@@ -24,15 +79,32 @@ def export_plan_to_excel(
     """Generate an Excel workbook containing the plan artefacts."""
 
     buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        flatten_plan(plan_data).to_excel(writer, sheet_name="Plan", index=False)
-        income_statement.to_excel(writer, sheet_name="P&L", index=False)
-        forecast_df.to_excel(writer, sheet_name="Forecast", index=False)
-        milestones_df.to_excel(writer, sheet_name="Milestones", index=False)
+    engine_kwargs = {"options": {"in_memory": True}} if EXCEL_ENGINE == "xlsxwriter" else {}
+    with pd.ExcelWriter(
+        buffer,
+        engine=EXCEL_ENGINE,
+        datetime_format="YYYY-MM-DD",
+        engine_kwargs=engine_kwargs,
+    ) as writer:
+        _write_plan_sheet(writer, plan_data)
+        _write_frame_sheet(writer, "P&L", income_statement)
+        _write_frame_sheet(writer, "Forecast", forecast_df)
+        _write_frame_sheet(writer, "Milestones", milestones_df)
     buffer.seek(0)
     return buffer.getvalue()
 
 
+@lru_cache(maxsize=None)
+def _register_pdf_font() -> str:
+    """Register the Japanese CID font with ReportLab once per process."""
+
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    pdfmetrics.registerFont(UnicodeCIDFont(PDF_FONT))
+    return PDF_FONT
+
+
 def export_plan_to_pdf(
     plan_data: Dict[str, Dict],
     narrative: str,
@@ -40,16 +112,19 @@ def export_plan_to_pdf(
 ) -> bytes:
     """Create a lightweight PDF summary using ReportLab."""
 
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    font = _register_pdf_font()
     buffer = BytesIO()
-    pdfmetrics.registerFont(UnicodeCIDFont("HeiseiKakuGo-W5"))
     c = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
     margin = 40
 
-    c.setFont("HeiseiKakuGo-W5", 16)
+    c.setFont(font, 16)
     c.drawString(margin, height - 60, f"{plan_data['overview']['company_name']} 経営計画要約")
 
-    c.setFont("HeiseiKakuGo-W5", 12)
+    c.setFont(font, 12)
     y = height - 110
     for line in narrative.split("。"):
         if not line:
@@ -58,19 +133,18 @@ def export_plan_to_pdf(
         y -= 18
         if y < margin:
             c.showPage()
-            c.setFont("HeiseiKakuGo-W5", 12)
+            c.setFont(font, 12)
             y = height - margin
 
-    c.setFont("HeiseiKakuGo-W5", 12)
+    c.setFont(font, 12)
     c.drawString(margin, y - 20, "主要KPI")
     y -= 50
-    for _, row in income_statement.iterrows():
-        text = f"{row['区分']}: {row['金額']:,}"
-        c.drawString(margin, y, text)
+    for label, amount in zip(income_statement["区分"], income_statement["金額"].to_numpy()):
+        c.drawString(margin, y, f"{label}: {amount:,}")
         y -= 18
         if y < margin:
             c.showPage()
-            c.setFont("HeiseiKakuGo-W5", 12)
+            c.setFont(font, 12)
             y = height - margin
 
     c.showPage()
@@ -86,6 +160,9 @@ def export_plan_to_ppt(
 ) -> bytes:
     """Produce a simple PowerPoint deck summarising the plan."""
 
+    from pptx import Presentation
+    from pptx.util import Pt
+
     prs = Presentation()
 
     # Title slide
@@ -111,9 +188,9 @@ def export_plan_to_ppt(
     body = slide.shapes.placeholders[1].text_frame
     body.clear()
     body.word_wrap = True
-    for _, row in income_statement.head(5).iterrows():
+    for label, amount in zip(income_statement["区分"][:5], income_statement["金額"].to_numpy()[:5]):
         paragraph = body.add_paragraph()
-        paragraph.text = f"{row['区分']}: {row['金額']:,}"
+        paragraph.text = f"{label}: {amount:,}"
         paragraph.font.size = Pt(18)
 
     # Narrative slide
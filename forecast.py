@@ -2,8 +2,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, List
+from functools import lru_cache
+from typing import Iterable, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -23,6 +25,16 @@ class ForecastScenario:
     cash_adjustment: float = 0.0
 
 
+# Preset scenarios as parallel arrays, one slot per scenario.
+PRESET_SCENARIOS = {
+    "name": np.array(["ベース", "ストレッチ", "ディフェンシブ"], dtype=object),
+    "sales_growth": np.array([0.08, 0.15, -0.05]),
+    "cogs_rate_delta": np.array([0.0, -0.02, 0.03]),
+    "opex_growth": np.array([0.02, 0.04, 0.0]),
+    "cash_adjustment": np.array([0.0, 2_000_000.0, -1_000_000.0]),
+}
+
+
 def generate_forecast_dataframe(
     inputs: FinancialInputs,
     scenarios: Iterable[ForecastScenario],
@@ -30,6 +42,31 @@ def generate_forecast_dataframe(
 ) -> pd.DataFrame:
     """Create a dataframe of monthly sales and cash balances for each scenario."""
 
+    scenarios = list(scenarios)
+    return _forecast_frame(
+        inputs,
+        [scenario.name for scenario in scenarios],
+        [scenario.sales_growth for scenario in scenarios],
+        [scenario.cogs_rate_delta for scenario in scenarios],
+        [scenario.opex_growth for scenario in scenarios],
+        [scenario.cash_adjustment for scenario in scenarios],
+        months,
+    )
+
+
+def _forecast_frame(
+    inputs: FinancialInputs,
+    names: Sequence[str],
+    sales_growth: Sequence[float],
+    cogs_delta: Sequence[float],
+    opex_growth: Sequence[float],
+    cash_adjustment: Sequence[float],
+    months: int,
+) -> pd.DataFrame:
+    """Evaluate scenarios given as parallel parameter sequences."""
+
+    if len(names) == 0:
+        return pd.DataFrame()
     base_sales = inputs.sales / months
     base_opex = (
         inputs.personnel_cost + inputs.marketing_cost + inputs.general_admin_cost
@@ -38,48 +75,77 @@ def generate_forecast_dataframe(
     interest_monthly = inputs.interest_payment / months
     depreciation_monthly = inputs.depreciation / months
 
-    records: List[dict] = []
-    for scenario in scenarios:
-        monthly_growth = (1 + scenario.sales_growth) ** (1 / months) - 1
-        monthly_opex_growth = (1 + scenario.opex_growth) ** (1 / months) - 1
-        cogs_rate = min(max(inputs.cogs_rate + scenario.cogs_rate_delta, 0.0), 0.95)
-        cash_balance = inputs.initial_cash + scenario.cash_adjustment
-
-        for month in range(1, months + 1):
-            sales = base_sales * ((1 + monthly_growth) ** (month - 1))
-            cogs = sales * cogs_rate
-            opex = base_opex * ((1 + monthly_opex_growth) ** (month - 1))
-            operating_cf = sales - cogs - opex
-            net_cash = (
-                operating_cf
-                + other_income_monthly
-                - interest_monthly
-                + depreciation_monthly
-            )
-            if month == 1:
-                net_cash -= inputs.capital_expenditure
-            cash_balance += net_cash
-            records.append(
-                {
-                    "シナリオ": scenario.name,
-                    "月": month,
-                    "売上": sales,
-                    "キャッシュ残高": cash_balance,
-                }
-            )
-    return pd.DataFrame(records)
+    # Parameters become column vectors: results are (scenarios x months).
+    names = np.asarray(names, dtype=object)
+    sales_growth = np.asarray(sales_growth, dtype=np.float64)
+    cogs_delta = np.asarray(cogs_delta, dtype=np.float64)
+    opex_growth = np.asarray(opex_growth, dtype=np.float64)
+    cash_adjustment = np.asarray(cash_adjustment, dtype=np.float64)
+
+    monthly_growth = (1 + sales_growth) ** (1 / months) - 1
+    monthly_opex_growth = (1 + opex_growth) ** (1 / months) - 1
+    cogs_rate = np.clip(inputs.cogs_rate + cogs_delta, 0.0, 0.95)
+
+    month_offsets = np.arange(months)
+    sales = base_sales * ((1 + monthly_growth)[:, None] ** month_offsets)
+    cogs = sales * cogs_rate[:, None]
+    opex = base_opex * ((1 + monthly_opex_growth)[:, None] ** month_offsets)
+    operating_cf = sales - cogs - opex
+    net_cash = (
+        operating_cf
+        + other_income_monthly
+        - interest_monthly
+        + depreciation_monthly
+    )
+    net_cash[:, 0] -= inputs.capital_expenditure
+    opening_cash = inputs.initial_cash + cash_adjustment
+    cash_balance = np.cumsum(np.column_stack((opening_cash, net_cash)), axis=1)[:, 1:]
+    return pd.DataFrame(
+        {
+            "シナリオ": np.repeat(names, months),
+            "月": np.tile(month_offsets + 1, len(names)),
+            "売上": sales.ravel(),
+            "キャッシュ残高": cash_balance.ravel(),
+        }
+    )
+
+
+@lru_cache(maxsize=128)
+def _cached_forecast_frame(
+    inputs: FinancialInputs,
+    names: Tuple[str, ...],
+    sales_growth: Tuple[float, ...],
+    cogs_delta: Tuple[float, ...],
+    opex_growth: Tuple[float, ...],
+    cash_adjustment: Tuple[float, ...],
+    months: int,
+) -> pd.DataFrame:
+    """Memoised :func:`_forecast_frame`; the shared frame must not be mutated."""
+
+    return _forecast_frame(
+        inputs, names, sales_growth, cogs_delta, opex_growth, cash_adjustment, months
+    )
+
+
+@lru_cache(maxsize=32)
+def _cached_forecast_chart(*cache_key) -> go.Figure:
+    """Memoised :func:`build_forecast_chart`; the shared figure must not be mutated."""
+
+    return build_forecast_chart(_cached_forecast_frame(*cache_key))
 
 
 def build_forecast_chart(df: pd.DataFrame) -> go.Figure:
     """Create a combined chart displaying sales and cash transitions."""
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
-    for scenario in df["シナリオ"].unique():
-        subset = df[df["シナリオ"] == scenario]
+    months = df["月"].to_numpy()
+    sales = df["売上"].to_numpy()
+    cash = df["キャッシュ残高"].to_numpy()
+    for scenario, rows in df.groupby("シナリオ", sort=False).indices.items():
         fig.add_trace(
             go.Scatter(
-                x=subset["月"],
-                y=subset["売上"],
+                x=months[rows],
+                y=sales[rows],
                 name=f"{scenario}｜売上",
                 mode="lines+markers",
             ),
@@ -87,8 +153,8 @@ def build_forecast_chart(df: pd.DataFrame) -> go.Figure:
         )
         fig.add_trace(
             go.Scatter(
-                x=subset["月"],
-                y=subset["キャッシュ残高"],
+                x=months[rows],
+                y=cash[rows],
                 name=f"{scenario}｜キャッシュ",
                 mode="lines",
                 line=dict(dash="dash"),
@@ -120,18 +186,17 @@ def render_forecast_section(inputs: FinancialInputs) -> pd.DataFrame:
             help="短期から中期までの月次視点で売上とキャッシュを俯瞰します。",
             key="forecast_months",
         )
-        scenario_configs: List[ForecastScenario] = []
-        labels = [
-            ("ベース", 0.08, 0.0, 0.02, 0.0),
-            ("ストレッチ", 0.15, -0.02, 0.04, 2_000_000.0),
-            ("ディフェンシブ", -0.05, 0.03, 0.0, -1_000_000.0),
-        ]
-        for name, growth, cogs_delta, opex_growth, cash_adj in labels:
+        names = PRESET_SCENARIOS["name"]
+        growths = PRESET_SCENARIOS["sales_growth"].copy()
+        cogs_deltas = PRESET_SCENARIOS["cogs_rate_delta"].copy()
+        opex_growths = PRESET_SCENARIOS["opex_growth"].copy()
+        cash_adjustments = PRESET_SCENARIOS["cash_adjustment"].copy()
+        for i, name in enumerate(names):
             cols = st.columns(4)
             with cols[0]:
-                growth_val = st.number_input(
+                growths[i] = st.number_input(
                     f"{name}｜売上成長率",
-                    value=growth,
+                    value=float(PRESET_SCENARIOS["sales_growth"][i]),
                     min_value=-0.5,
                     max_value=0.8,
                     step=0.01,
@@ -139,9 +204,9 @@ def render_forecast_section(inputs: FinancialInputs) -> pd.DataFrame:
                     key=f"growth_{name}",
                 )
             with cols[1]:
-                cogs_delta_val = st.number_input(
+                cogs_deltas[i] = st.number_input(
                     f"{name}｜原価率変化",
-                    value=cogs_delta,
+                    value=float(PRESET_SCENARIOS["cogs_rate_delta"][i]),
                     min_value=-0.3,
                     max_value=0.3,
                     step=0.005,
@@ -149,9 +214,9 @@ def render_forecast_section(inputs: FinancialInputs) -> pd.DataFrame:
                     key=f"cogs_{name}",
                 )
             with cols[2]:
-                opex_growth_val = st.number_input(
+                opex_growths[i] = st.number_input(
                     f"{name}｜販管費成長",
-                    value=opex_growth,
+                    value=float(PRESET_SCENARIOS["opex_growth"][i]),
                     min_value=-0.3,
                     max_value=0.6,
                     step=0.01,
@@ -159,33 +224,32 @@ def render_forecast_section(inputs: FinancialInputs) -> pd.DataFrame:
                     key=f"opex_{name}",
                 )
             with cols[3]:
-                cash_adj_val = st.number_input(
+                cash_adjustments[i] = st.number_input(
                     f"{name}｜初期キャッシュ調整",
-                    value=cash_adj,
+                    value=float(PRESET_SCENARIOS["cash_adjustment"][i]),
                     step=500000.0,
                     help="追加調達や特別配当など初期のキャッシュ増減を設定します。",
                     key=f"cash_{name}",
                 )
-            scenario_configs.append(
-                ForecastScenario(
-                    name=name,
-                    sales_growth=growth_val,
-                    cogs_rate_delta=cogs_delta_val,
-                    opex_growth=opex_growth_val,
-                    cash_adjustment=cash_adj_val,
-                )
-            )
 
-    forecast_df = generate_forecast_dataframe(inputs, scenario_configs, months=months)
-    fig = build_forecast_chart(forecast_df)
-    st.plotly_chart(fig, use_container_width=True)
-
-    latest = (
-        forecast_df.sort_values(["シナリオ", "月"]).groupby("シナリオ").tail(1)
+    cache_key = (
+        inputs,
+        tuple(names),
+        tuple(growths.tolist()),
+        tuple(cogs_deltas.tolist()),
+        tuple(opex_growths.tolist()),
+        tuple(cash_adjustments.tolist()),
+        months,
     )
-    for _, row in latest.iterrows():
+    forecast_df = _cached_forecast_frame(*cache_key)
+    st.plotly_chart(_cached_forecast_chart(*cache_key), use_container_width=True)
+
+    # Rows are emitted scenario by scenario in month order, so every months-th
+    # row is a scenario's final month.
+    latest = forecast_df.iloc[months - 1 :: months]
+    for name, cash in zip(latest["シナリオ"].to_numpy(), latest["キャッシュ残高"].to_numpy()):
         st.metric(
-            label=f"{row['シナリオ']}シナリオ 最終月キャッシュ",
-            value=format_currency(row["キャッシュ残高"]),
+            label=f"{name}シナリオ 最終月キャッシュ",
+            value=format_currency(cash),
         )
     return forecast_df
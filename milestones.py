@@ -1,26 +1,71 @@
 """Milestone management and visualisation utilities."""
 from __future__ import annotations
 
-from datetime import date, timedelta
+from datetime import date
 
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
-from utils import ensure_serialisable_dataframe, save_encrypted_payload
+from utils import frame_digest, save_encrypted_payload, serialise_records
 
 
 COLUMNS = ["マイルストーン", "予定日", "実績日", "担当者", "進捗率"]
 
+EMPTY_MILESTONES = pd.DataFrame({column: pd.Series(dtype="object") for column in COLUMNS})
 
-def _prepare_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+
+def _prepare_dataframe(df: pd.DataFrame, *, copy: bool = True) -> pd.DataFrame:
+    if copy:
+        df = df.copy()
     for column in ["予定日", "実績日"]:
-        df[column] = pd.to_datetime(df[column], errors="coerce").dt.date
-    df["進捗率"] = df["進捗率"].fillna(0).clip(lower=0, upper=100).astype(int)
+        df[column] = pd.to_datetime(df[column], errors="coerce")
+    progress = df["進捗率"].to_numpy(dtype=np.float64, na_value=0.0)
+    np.clip(progress, 0, 100, out=progress)
+    df["進捗率"] = progress.astype(np.int16)
     return df
 
 
+def _gantt_figure(df: pd.DataFrame, today: date):
+    """Build the timeline figure, reusing the session's last one when unchanged."""
+
+    cache_key = (frame_digest(df), today)
+    cached = st.session_state.get("_milestone_gantt")
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+
+    planned = df["予定日"]
+    start = planned.fillna(pd.Timestamp(today))
+    # Ends fall back to a week after the plan date, or after today when undated.
+    end = df["実績日"].fillna(planned + pd.Timedelta(days=7)).fillna(start + pd.Timedelta(days=7))
+    fig = go.Figure(
+        go.Bar(
+            base=start.to_numpy(),
+            x=((end - start) // pd.Timedelta(milliseconds=1)).to_numpy(),
+            y=df["担当者"].to_numpy(),
+            orientation="h",
+            hovertext=df["マイルストーン"].to_numpy(),
+            hovertemplate=(
+                "<b>%{hovertext}</b><br><br>開始=%{base}<br>終了=%{x}<br>担当者=%{y}"
+                "<br>進捗率=%{marker.color}<extra></extra>"
+            ),
+            marker=dict(color=df["進捗率"].to_numpy(), coloraxis="coloraxis"),
+        )
+    )
+    fig.update_layout(
+        xaxis_type="date",
+        yaxis_title_text="担当者",
+        coloraxis=dict(colorscale="Blues", colorbar_title_text="進捗率"),
+        barmode="overlay",
+        height=420,
+        margin=dict(l=40, r=40, t=40, b=40),
+        plot_bgcolor="white",
+    )
+    st.session_state["_milestone_gantt"] = (cache_key, fig)
+    return fig
+
+
 def render_milestone_manager() -> pd.DataFrame:
     """Render the milestone table editor and Gantt-style timeline."""
 
@@ -52,42 +97,22 @@ def render_milestone_manager() -> pd.DataFrame:
         key="milestone_editor",
     )
 
-    edited_df = _prepare_dataframe(edited_df)
+    edited_df = _prepare_dataframe(edited_df, copy=False)
     st.session_state["milestones"] = edited_df
-    serialised = ensure_serialisable_dataframe(edited_df)
-    st.session_state["plan_data"]["milestones"] = serialised.to_dict("records")
+    st.session_state["plan_data"]["milestones"] = serialise_records(edited_df)
     save_encrypted_payload(st.session_state["plan_data"])
 
-    late_items = edited_df[(edited_df["進捗率"] < 100) & (edited_df["予定日"].notna())]
     today = date.today()
-    for _, row in late_items.iterrows():
-        if row["予定日"] and row["予定日"] < today:
-            st.error(f"{row['マイルストーン']}：予定日を過ぎています。リカバリー策を検討しましょう。")
+    late = (edited_df["進捗率"] < 100) & (edited_df["予定日"] < pd.Timestamp(today))
+    late_names = edited_df.loc[late, "マイルストーン"].tolist()
+    if late_names:
+        st.error(
+            "予定日を過ぎているマイルストーンがあります。リカバリー策を検討しましょう。\n\n"
+            + "\n".join(f"- {name}" for name in late_names)
+        )
 
     if not edited_df.empty:
-        gantt_df = edited_df.copy()
-        gantt_df["開始"] = gantt_df["予定日"].fillna(today)
-        gantt_df["終了"] = gantt_df.apply(
-            lambda r: r["実績日"]
-            if pd.notnull(r["実績日"])
-            else (r["予定日"] + timedelta(days=7) if pd.notnull(r["予定日"]) else today + timedelta(days=7)),
-            axis=1,
-        )
-        fig = px.timeline(
-            gantt_df,
-            x_start="開始",
-            x_end="終了",
-            y="担当者",
-            color="進捗率",
-            hover_name="マイルストーン",
-            color_continuous_scale="Blues",
-        )
-        fig.update_layout(
-            height=420,
-            margin=dict(l=40, r=40, t=40, b=40),
-            plot_bgcolor="white",
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(_gantt_figure(edited_df, today), use_container_width=True)
     else:
         st.info("マイルストーンを入力するとガントチャートが表示されます。")
 
@@ -77,4 +77,4 @@ def show_onboarding_tour() -> None:
     if st.button("ツアーを開始", type="primary"):
         st.session_state["onboarding_shown"] = True
         placeholder.empty()
-        st.experimental_rerun()
+        st.rerun()
@@ -17,10 +17,7 @@ THEME_COLORS: dict[str, str] = {
 }
 
 
-def inject_custom_style() -> None:
-    """Inject consistent theming and responsive tweaks."""
-
-    custom_style = f"""
+_CUSTOM_STYLE = f"""
     <style>
     :root {{
         --app-bg: {THEME_COLORS['background']};
@@ -122,7 +119,12 @@ def inject_custom_style() -> None:
     }}
     </style>
     """
-    st.markdown(custom_style, unsafe_allow_html=True)
+
+
+def inject_custom_style() -> None:
+    """Inject consistent theming and responsive tweaks."""
+
+    st.markdown(_CUSTOM_STYLE, unsafe_allow_html=True)
 
 
 def section_header(title: str, subtitle: str | None = None) -> None:
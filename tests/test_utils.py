@@ -1,3 +1,5 @@
+from dataclasses import asdict
+from io import BytesIO
 from pathlib import Path
 import sys
 
@@ -8,7 +10,18 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from export import export_plan_to_excel, export_plan_to_pdf, export_plan_to_ppt
 from forecast import ForecastScenario, generate_forecast_dataframe
-from utils import FinancialInputs, calc_cashflow_projection, calc_income_statement
+from utils import (
+    FinancialInputs,
+    cached_income_statement,
+    calc_cashflow_projection,
+    calc_income_statement,
+    format_currency,
+    format_percentage,
+    load_encrypted_payload,
+    save_encrypted_payload,
+    serialise_records,
+    validate_required_fields,
+)
 
 
 @pytest.fixture
@@ -38,12 +51,42 @@ def test_calc_income_statement(sample_financial_inputs: FinancialInputs) -> None
     assert summary["net_income"] > 0
 
 
+def test_cached_income_statement_reuses_equal_inputs(sample_financial_inputs: FinancialInputs) -> None:
+    first = cached_income_statement(sample_financial_inputs)
+    second = cached_income_statement(FinancialInputs(**asdict(sample_financial_inputs)))
+    assert first is second
+
+
 def test_cashflow_projection_monotonic(sample_financial_inputs: FinancialInputs) -> None:
     df = calc_cashflow_projection(sample_financial_inputs, months=12)
     assert len(df) == 12
     assert df["累計現金残高"].iloc[-1] >= df["累計現金残高"].iloc[0]
 
 
+def test_cashflow_projection_rolls_forward_opening_cash(sample_financial_inputs: FinancialInputs) -> None:
+    df = calc_cashflow_projection(sample_financial_inputs, months=12)
+    assert df["月"].tolist() == list(range(1, 13))
+    assert df["投資キャッシュフロー"].iloc[0] == -sample_financial_inputs.capital_expenditure
+    assert (df["投資キャッシュフロー"].iloc[1:] == 0).all()
+    expected_closing = (
+        sample_financial_inputs.initial_cash
+        + df["フリーキャッシュフロー"].sum()
+        + sample_financial_inputs.depreciation
+    )
+    assert pytest.approx(df["累計現金残高"].iloc[-1], rel=1e-9) == expected_closing
+
+
+def test_validate_required_fields() -> None:
+    errors = validate_required_fields(
+        {"company_name": "  ", "vision": "成長", "sales": 0.0},
+        [("company_name", "会社名"), ("vision", "ビジョン"), ("sales", "売上高"), ("mission", "ミッション")],
+    )
+    assert errors == {
+        "company_name": "会社名は必須項目です。",
+        "mission": "ミッションは必須項目です。",
+    }
+
+
 def test_generate_forecast_dataframe(sample_financial_inputs: FinancialInputs) -> None:
     scenarios = [
         ForecastScenario(name="ベース", sales_growth=0.1, cogs_rate_delta=0.0, opex_growth=0.02),
@@ -79,7 +122,7 @@ def test_export_generates_files(sample_financial_inputs: FinancialInputs) -> Non
     excel_bytes = export_plan_to_excel(
         {
             "overview": {"company_name": "テスト株式会社"},
-            "financials": sample_financial_inputs.__dict__,
+            "financials": asdict(sample_financial_inputs),
             "milestones": milestones_df.to_dict("records"),
         },
         income_statement,
@@ -111,3 +154,67 @@ def test_export_generates_files(sample_financial_inputs: FinancialInputs) -> Non
         income_statement,
     )
     assert len(ppt_bytes) > 1000
+
+
+def test_formatters_render_nan_as_na() -> None:
+    assert format_currency(float("nan")) == "N/A"
+    assert format_percentage(float("nan")) == "N/A"
+    assert format_percentage(0.125) == "12.5%"
+
+
+def test_serialise_records_formats_dates() -> None:
+    df = pd.DataFrame(
+        {
+            "予定日": pd.to_datetime(["2025-04-01", None]),
+            "進捗率": pd.Series([50, 0], dtype="int16"),
+        }
+    )
+    assert serialise_records(df) == [
+        {"予定日": "2025-04-01", "進捗率": 50},
+        {"予定日": "", "進捗率": 0},
+    ]
+
+
+def test_save_encrypted_payload_replaces_atomically_and_skips_unchanged(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("PLAN_STORAGE_DIR", str(tmp_path))
+    filename = "persistence_test.bin"
+    original = {"overview": {"company_name": "テスト株式会社"}}
+    updated = {"overview": {"company_name": "更新株式会社"}}
+    path = save_encrypted_payload(original, filename)
+
+    def failing_replace(src: str, dst: Path) -> None:
+        raise OSError("disk full")
+
+    # A failed replace leaves the previous file intact and no temp file behind.
+    with monkeypatch.context() as patch:
+        patch.setattr("utils.os.replace", failing_replace)
+        with pytest.raises(OSError):
+            save_encrypted_payload(updated, filename)
+    assert list(tmp_path.iterdir()) == [path]
+    assert load_encrypted_payload(filename) == original
+
+    # The failed payload is not recorded as persisted, so it is written on retry.
+    assert save_encrypted_payload(updated, filename) == path
+    assert load_encrypted_payload(filename) == updated
+
+    monkeypatch.setattr("utils._write_encrypted", lambda *args: pytest.fail("unchanged payload rewritten"))
+    assert save_encrypted_payload(updated, filename) == path
+
+
+def test_excel_export_writes_non_finite_plan_values(sample_financial_inputs: FinancialInputs) -> None:
+    income_statement, _ = calc_income_statement(sample_financial_inputs)
+    financials = asdict(sample_financial_inputs)
+    financials["sales"] = float("nan")
+    financials["other_income"] = float("inf")
+    excel_bytes = export_plan_to_excel(
+        {"overview": {"company_name": "テスト株式会社"}, "financials": financials},
+        income_statement,
+        pd.DataFrame(),
+        pd.DataFrame(),
+    )
+    plan_sheet = pd.read_excel(BytesIO(excel_bytes), sheet_name="Plan")
+    values = dict(zip(plan_sheet["項目"], plan_sheet["内容"]))
+    assert pd.isna(values["sales"])
+    assert values["other_income"] == "inf"
@@ -1,10 +1,14 @@
 """Utility functions shared across the business planning application."""
 from __future__ import annotations
 
+import hashlib
 import json
 import locale
 import os
+import tempfile
+from copy import deepcopy
 from dataclasses import dataclass
+from functools import lru_cache
 from datetime import date, datetime
 from pathlib import Path
 from typing import Any, Dict, Iterable, Tuple
@@ -14,8 +18,13 @@ import pandas as pd
 import streamlit as st
 from cryptography.fernet import Fernet
 
+try:
+    import orjson
+except ImportError:  # optional speed-up; the standard json module is the fallback
+    orjson = None
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class FinancialInputs:
     """Input parameters required for financial projections."""
 
@@ -82,6 +91,42 @@ DEFAULT_PLAN: Dict[str, Any] = {
 }
 
 
+INCOME_STATEMENT_LABELS: Tuple[str, ...] = (
+    "売上高",
+    "売上原価",
+    "粗利",
+    "営業費用",
+    "営業利益",
+    "営業外収益",
+    "営業外費用",
+    "経常利益",
+    "法人税等",
+    "当期純利益",
+)
+
+
+# Operating-expense inputs, as (FinancialInputs field, label) pairs, summed into
+# 営業費用 by calc_income_statement.
+OPEX_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("personnel_cost", "人件費"),
+    ("marketing_cost", "マーケティング費"),
+    ("general_admin_cost", "一般管理費"),
+    ("depreciation", "減価償却費"),
+)
+
+
+DEFAULT_MILESTONES = pd.DataFrame(
+    {
+        "マイルストーン": ["顧客開拓キャンペーン開始"],
+        "予定日": [date(datetime.now().year, 4, 1)],
+        "実績日": [None],
+        "担当者": ["営業チーム"],
+        "進捗率": [0],
+    }
+)
+
+
+@lru_cache(maxsize=None)
 def _ensure_locale() -> None:
     """Set locale for Japanese yen formatting when possible."""
 
@@ -96,26 +141,20 @@ def initialize_session_state() -> None:
     """Populate Streamlit session state with default values if necessary."""
 
     if "plan_data" not in st.session_state:
-        st.session_state["plan_data"] = json.loads(json.dumps(DEFAULT_PLAN, default=str))
-    st.session_state.setdefault("milestones", pd.DataFrame(
-        [
-            {
-                "マイルストーン": "顧客開拓キャンペーン開始",
-                "予定日": date(datetime.now().year, 4, 1),
-                "実績日": None,
-                "担当者": "営業チーム",
-                "進捗率": 0,
-            }
-        ]
-    ))
+        st.session_state["plan_data"] = deepcopy(DEFAULT_PLAN)
+    if "milestones" not in st.session_state:
+        st.session_state["milestones"] = DEFAULT_MILESTONES.copy()
     st.session_state.setdefault("wizard_step", 0)
     st.session_state.setdefault("show_wizard", False)
     st.session_state.setdefault("onboarding_shown", False)
 
 
+@lru_cache(maxsize=2048)
 def format_currency(value: float, unit: str = "円") -> str:
     """Format currency values with Japanese locale."""
 
+    if value != value:  # NaN, without a NumPy ufunc call
+        return "N/A"
     _ensure_locale()
     try:
         formatted = locale.currency(value, grouping=True)
@@ -124,9 +163,12 @@ def format_currency(value: float, unit: str = "円") -> str:
     return f"{formatted} ({unit})"
 
 
+@lru_cache(maxsize=2048)
 def format_percentage(value: float) -> str:
     """Format ratio as percentage string."""
 
+    if value != value:
+        return "N/A"
     return f"{value * 100:.1f}%"
 
 
@@ -145,16 +187,11 @@ def calc_income_statement(inputs: FinancialInputs) -> Tuple[pd.DataFrame, Dict[s
 
     gross_profit = sales - cogs
 
-    opex_items = {
-        "人件費": inputs.personnel_cost,
-        "マーケティング費": inputs.marketing_cost,
-        "一般管理費": inputs.general_admin_cost,
-        "減価償却費": inputs.depreciation,
-    }
-    for label, value in opex_items.items():
+    opex_values = [getattr(inputs, field) for field, _ in OPEX_FIELDS]
+    for (_, label), value in zip(OPEX_FIELDS, opex_values):
         if value < 0:
             raise ValueError(f"{label}はマイナスにできません。")
-    operating_expenses = sum(opex_items.values())
+    operating_expenses = sum(opex_values)
     operating_profit = gross_profit - operating_expenses
 
     other_income = inputs.other_income
@@ -175,20 +212,22 @@ def calc_income_statement(inputs: FinancialInputs) -> Tuple[pd.DataFrame, Dict[s
         inputs.personnel_cost / gross_profit if gross_profit > 0 else np.nan
     )
 
-    income_statement = pd.DataFrame(
+    amounts = np.array(
         [
-            {"区分": "売上高", "金額": sales},
-            {"区分": "売上原価", "金額": -cogs},
-            {"区分": "粗利", "金額": gross_profit},
-            {"区分": "営業費用", "金額": -operating_expenses},
-            {"区分": "営業利益", "金額": operating_profit},
-            {"区分": "営業外収益", "金額": other_income},
-            {"区分": "営業外費用", "金額": -interest},
-            {"区分": "経常利益", "金額": ordinary_profit},
-            {"区分": "法人税等", "金額": -taxes},
-            {"区分": "当期純利益", "金額": net_income},
-        ]
+            sales,
+            -cogs,
+            gross_profit,
+            -operating_expenses,
+            operating_profit,
+            other_income,
+            -interest,
+            ordinary_profit,
+            -taxes,
+            net_income,
+        ],
+        dtype=np.float64,
     )
+    income_statement = pd.DataFrame({"区分": INCOME_STATEMENT_LABELS, "金額": amounts})
 
     summary = {
         "gross_margin_rate": gross_profit / sales if sales else 0,
@@ -213,31 +252,32 @@ def calc_cashflow_projection(inputs: FinancialInputs, months: int = 12) -> pd.Da
     monthly_admin = inputs.general_admin_cost / months
     monthly_interest = inputs.interest_payment / months
 
-    records = []
-    cumulative_cash = inputs.initial_cash
-    for month in range(1, months + 1):
-        cash_in = monthly_sales + (inputs.other_income / months)
-        cash_out = (
-            monthly_cogs
-            + monthly_personnel
-            + monthly_marketing
-            + monthly_admin
-            + monthly_interest
-        )
-        investment_cf = -inputs.capital_expenditure if month == 1 else 0.0
-        operating_cf = cash_in - cash_out
-        net = operating_cf + investment_cf
-        cumulative_cash += net + (inputs.depreciation / months)
-        records.append(
-            {
-                "月": month,
-                "営業キャッシュフロー": operating_cf,
-                "投資キャッシュフロー": investment_cf,
-                "フリーキャッシュフロー": net,
-                "累計現金残高": cumulative_cash,
-            }
-        )
-    return pd.DataFrame(records)
+    cash_in = monthly_sales + (inputs.other_income / months)
+    cash_out = (
+        monthly_cogs
+        + monthly_personnel
+        + monthly_marketing
+        + monthly_admin
+        + monthly_interest
+    )
+    operating_cf = np.full(months, cash_in - cash_out, dtype=np.float64)
+    investment_cf = np.zeros(months, dtype=np.float64)
+    investment_cf[:1] = -inputs.capital_expenditure
+    net = operating_cf + investment_cf
+    # Seed the running sum with the opening balance so accumulation order matches
+    # a month-by-month roll-forward.
+    cumulative_cash = np.cumsum(
+        np.concatenate(([inputs.initial_cash], net + (inputs.depreciation / months)))
+    )[1:]
+    return pd.DataFrame(
+        {
+            "月": np.arange(1, months + 1),
+            "営業キャッシュフロー": operating_cf,
+            "投資キャッシュフロー": investment_cf,
+            "フリーキャッシュフロー": net,
+            "累計現金残高": cumulative_cash,
+        }
+    )
 
 
 def generate_financial_narrative(inputs: FinancialInputs, summary: Dict[str, float]) -> str:
@@ -254,15 +294,35 @@ def generate_financial_narrative(inputs: FinancialInputs, summary: Dict[str, flo
     )
 
 
+@lru_cache(maxsize=512)
+def cached_income_statement(inputs: FinancialInputs) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Memoised :func:`calc_income_statement`; the shared result must not be mutated."""
+
+    return calc_income_statement(inputs)
+
+
+@lru_cache(maxsize=512)
+def cached_cashflow_projection(inputs: FinancialInputs, months: int = 12) -> pd.DataFrame:
+    """Memoised :func:`calc_cashflow_projection`; the shared frame must not be mutated."""
+
+    return calc_cashflow_projection(inputs, months)
+
+
+@lru_cache(maxsize=512)
+def cached_financial_narrative(inputs: FinancialInputs) -> str:
+    """Memoised :func:`generate_financial_narrative` for the inputs' own summary."""
+
+    return generate_financial_narrative(inputs, cached_income_statement(inputs)[1])
+
+
 def validate_required_fields(data: Dict[str, Any], required_fields: Iterable[Tuple[str, str]]) -> Dict[str, str]:
     """Validate required fields returning error messages keyed by field."""
 
-    errors: Dict[str, str] = {}
-    for field, label in required_fields:
-        value = data.get(field)
-        if value is None or (isinstance(value, str) and not value.strip()):
-            errors[field] = f"{label}は必須項目です。"
-    return errors
+    return {
+        field: f"{label}は必須項目です。"
+        for field, label in required_fields
+        if (value := data.get(field)) is None or (isinstance(value, str) and not value.strip())
+    }
 
 
 def _normalise_datetime(value: Any) -> Any:
@@ -271,51 +331,112 @@ def _normalise_datetime(value: Any) -> Any:
     return value
 
 
-def _get_crypto_key() -> bytes:
+@lru_cache(maxsize=1)
+def _env_crypto_key() -> bytes | None:
     env_key = os.getenv("APP_CRYPTO_KEY")
+    return env_key.encode("utf-8") if env_key else None
+
+
+@lru_cache(maxsize=4)
+def _cipher_for(key: bytes) -> Fernet:
+    return Fernet(key)
+
+
+def _get_crypto_key() -> bytes:
+    env_key = _env_crypto_key()
     if env_key:
-        return env_key.encode("utf-8")
+        return env_key
     if "_crypto_key" not in st.session_state:
         st.session_state["_crypto_key"] = Fernet.generate_key()
     return st.session_state["_crypto_key"]
 
 
+def _serialise_plan(data: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=_normalise_datetime, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(data, sort_keys=True, default=_normalise_datetime).encode("utf-8")
+
+
+def _digest(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def plan_digest(data: Dict[str, Any]) -> str:
+    """Return a stable content digest of plan data for use as a cache key."""
+
+    return _digest(_serialise_plan(data))
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Return a content digest of a dataframe for use as a cache key."""
+
+    hasher = hashlib.blake2b(repr(list(df.columns)).encode("utf-8"), digest_size=16)
+    if not df.empty:
+        hasher.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return hasher.hexdigest()
+
+
+def _storage_path(filename: str) -> Path:
+    return Path(os.getenv("PLAN_STORAGE_DIR", ".secure")) / filename
+
+
+def _write_encrypted(payload: bytes, key: bytes, filename: str) -> Path:
+    path = _storage_path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    encrypted = _cipher_for(key).encrypt(payload)
+    # Write a uniquely named sibling temp file, then rename it over the target.
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(encrypted)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return path
+
+
 def save_encrypted_payload(data: Dict[str, Any], filename: str = "plan_secure.bin") -> Path:
-    """Encrypt and persist plan data locally for future retrieval."""
-
-    storage_dir = Path(os.getenv("PLAN_STORAGE_DIR", ".secure"))
-    storage_dir.mkdir(parents=True, exist_ok=True)
-    payload = json.dumps(data, default=_normalise_datetime).encode("utf-8")
-    cipher = Fernet(_get_crypto_key())
-    encrypted = cipher.encrypt(payload)
-    path = storage_dir / filename
-    path.write_bytes(encrypted)
+    """Encrypt and persist plan data locally, skipping unchanged payloads."""
+
+    payload = _serialise_plan(data)
+    # The digest is recorded only once the write succeeds, so a failed save is
+    # retried on the next call instead of being treated as already on disk.
+    state_key = f"_persisted_digest::{filename}"
+    digest = _digest(payload)
+    if st.session_state.get(state_key) == digest:
+        return _storage_path(filename)
+    path = _write_encrypted(payload, _get_crypto_key(), filename)
+    st.session_state[state_key] = digest
     return path
 
 
 def load_encrypted_payload(filename: str = "plan_secure.bin") -> Dict[str, Any] | None:
     """Load encrypted plan data if available."""
 
-    storage_dir = Path(os.getenv("PLAN_STORAGE_DIR", ".secure"))
-    path = storage_dir / filename
+    path = _storage_path(filename)
     if not path.exists():
         return None
-    cipher = Fernet(_get_crypto_key())
-    decrypted = cipher.decrypt(path.read_bytes())
+    decrypted = _cipher_for(_get_crypto_key()).decrypt(path.read_bytes())
     return json.loads(decrypted.decode("utf-8"))
 
 
 def flatten_plan(plan_data: Dict[str, Any]) -> pd.DataFrame:
     """Flatten nested plan data into a tabular representation for export."""
 
-    records = []
+    sections: list[str] = []
+    keys: list[Any] = []
+    values: list[Any] = []
     for section, contents in plan_data.items():
         if isinstance(contents, dict):
-            for key, value in contents.items():
-                records.append({"セクション": section, "項目": key, "内容": value})
+            sections.extend([section] * len(contents))
+            keys.extend(contents.keys())
+            values.extend(contents.values())
         else:
-            records.append({"セクション": section, "項目": "value", "内容": contents})
-    return pd.DataFrame(records)
+            sections.append(section)
+            keys.append("value")
+            values.append(contents)
+    return pd.DataFrame({"セクション": sections, "項目": keys, "内容": values})
 
 
 def plan_to_financial_inputs(plan_data: Dict[str, Any]) -> FinancialInputs:
@@ -325,11 +446,14 @@ def plan_to_financial_inputs(plan_data: Dict[str, Any]) -> FinancialInputs:
     return FinancialInputs(**financials)
 
 
-def ensure_serialisable_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Prepare a dataframe for JSON export by casting dates to isoformat."""
+def serialise_records(df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Return dataframe rows as JSON-ready records with dates as isoformat."""
 
-    converted = df.copy()
-    for col in converted.columns:
-        if np.issubdtype(converted[col].dtype, np.datetime64):
-            converted[col] = converted[col].dt.date.apply(lambda x: x.isoformat() if x else "")
-    return converted
+    columns = [
+        df[col].dt.strftime("%Y-%m-%d").fillna("").tolist()
+        if np.issubdtype(df[col].dtype, np.datetime64)
+        else df[col].tolist()
+        for col in df.columns
+    ]
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
@@ -1,23 +1,32 @@
 """Interactive wizard for guiding users through business plan creation."""
 from __future__ import annotations
 
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, Tuple
 
 import streamlit as st
 
 from utils import (
     FinancialInputs,
-    calc_income_statement,
-    generate_financial_narrative,
+    cached_financial_narrative,
     save_encrypted_payload,
     validate_required_fields,
 )
 
 
-Renderer = Callable[[Dict[str, str]], Tuple[Dict[str, str], List[Tuple[str, str]]]]
+# (field, label) pairs a step must fill in.
+Required = Tuple[Tuple[str, str], ...]
+Renderer = Callable[[Dict[str, str]], Tuple[Dict[str, str], Required]]
 
 
-def _render_overview_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+_OVERVIEW_REQUIRED = (
+    ("company_name", "会社名"),
+    ("vision", "ビジョン"),
+    ("mission", "ミッション"),
+    ("value_proposition", "バリュープロポジション"),
+)
+
+
+def _render_overview_step(values: Dict[str, str]) -> Tuple[Dict[str, str], Required]:
     st.write(
         "企業アイデンティティを一気通貫で言語化し、投資家や金融機関へブレないメッセージを届けます。"
     )
@@ -62,16 +71,13 @@ def _render_overview_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[
         "value_proposition": value_proposition,
         "target_market": target_market,
     }
-    required = [
-        ("company_name", "会社名"),
-        ("vision", "ビジョン"),
-        ("mission", "ミッション"),
-        ("value_proposition", "バリュープロポジション"),
-    ]
-    return data, required
+    return data, _OVERVIEW_REQUIRED
+
 
+_THREE_C_REQUIRED = (("customer", "顧客"), ("company", "自社"), ("competitor", "競合"))
 
-def _render_three_c_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+
+def _render_three_c_step(values: Dict[str, str]) -> Tuple[Dict[str, str], Required]:
     st.write("3C分析で市場・競合・自社の立ち位置を俯瞰し、勝ち筋を特定します。")
     customer = st.text_area(
         "Customer｜顧客",
@@ -99,11 +105,13 @@ def _render_three_c_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[T
         "company": company,
         "competitor": competitor,
     }
-    required = [("customer", "顧客"), ("company", "自社"), ("competitor", "競合")]
-    return data, required
+    return data, _THREE_C_REQUIRED
+
+
+_SWOT_REQUIRED = (("strengths", "強み"), ("opportunities", "機会"), ("threats", "脅威"))
 
 
-def _render_swot_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+def _render_swot_step(values: Dict[str, str]) -> Tuple[Dict[str, str], Required]:
     st.write("SWOTのクロス分析で攻めと守りの戦略オプションを抽出します。")
     strengths = st.text_area(
         "Strengths｜強み",
@@ -139,11 +147,13 @@ def _render_swot_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tupl
         "opportunities": opportunities,
         "threats": threats,
     }
-    required = [("strengths", "強み"), ("opportunities", "機会"), ("threats", "脅威")]
-    return data, required
+    return data, _SWOT_REQUIRED
 
 
-def _render_pest_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+_PEST_REQUIRED = (("political", "政治"), ("economic", "経済"), ("technological", "技術"))
+
+
+def _render_pest_step(values: Dict[str, str]) -> Tuple[Dict[str, str], Required]:
     st.write("マクロ環境をPESTの4視点で俯瞰し、シナリオプランニングを支えます。")
     political = st.text_area(
         "Political｜政治",
@@ -179,11 +189,13 @@ def _render_pest_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tupl
         "social": social,
         "technological": technological,
     }
-    required = [("political", "政治"), ("economic", "経済"), ("technological", "技術")]
-    return data, required
+    return data, _PEST_REQUIRED
+
+
+_FOUR_P_REQUIRED = (("product", "Product"), ("price", "Price"))
 
 
-def _render_four_p_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+def _render_four_p_step(values: Dict[str, str]) -> Tuple[Dict[str, str], Required]:
     st.write("マーケティング4Pで提供価値とチャネル戦略を統合設計します。")
     product = st.text_area(
         "Product",
@@ -219,11 +231,13 @@ def _render_four_p_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tu
         "place": place,
         "promotion": promotion,
     }
-    required = [("product", "Product"), ("price", "Price")]
-    return data, required
+    return data, _FOUR_P_REQUIRED
 
 
-def _render_financial_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+_FINANCIAL_REQUIRED = (("sales", "年間売上高"), ("cogs_rate", "売上原価率"))
+
+
+def _render_financial_step(values: Dict[str, str]) -> Tuple[Dict[str, str], Required]:
     st.write("財務KPIを入力すると損益計算書とサマリーを自動生成します。")
     cols = st.columns(2)
     with cols[0]:
@@ -341,18 +355,26 @@ def _render_financial_step(values: Dict[str, str]) -> Tuple[Dict[str, str], List
         "capital_expenditure": capital_expenditure,
         "fiscal_year": fiscal_year,
     }
-    required = [("sales", "年間売上高"), ("cogs_rate", "売上原価率")]
-    return data, required
+    return data, _FINANCIAL_REQUIRED
 
 
-STEP_FLOW: List[Tuple[str, str, str, Callable[[Dict[str, str]], Tuple[Dict[str, str], List[Tuple[str, str]]]]]] = [
+STEP_FLOW: Tuple[Tuple[str, str, str, Renderer], ...] = (
     ("overview", "STEP1", "事業コンセプト", _render_overview_step),
     ("three_c", "STEP2", "3C分析", _render_three_c_step),
     ("swot", "STEP3", "SWOT分析", _render_swot_step),
     ("pest", "STEP4", "PEST分析", _render_pest_step),
     ("four_p", "STEP5", "4Pマーケティング", _render_four_p_step),
     ("financials", "STEP6", "財務計画", _render_financial_step),
-]
+)
+TOTAL_STEPS = len(STEP_FLOW)
+
+
+_HERO_HTML = """
+        <div class="hero-banner">
+            <h1>事業計画ウィザード</h1>
+            <p>フレームワークごとの入力を順番にナビゲートし、整合性のとれた経営ストーリーを自動生成します。</p>
+        </div>
+        """
 
 
 def run_plan_wizard() -> None:
@@ -360,19 +382,10 @@ def run_plan_wizard() -> None:
 
     plan_data = st.session_state["plan_data"]
     step_index = st.session_state.get("wizard_step", 0)
-    total_steps = len(STEP_FLOW)
     current_section, step_code, step_title, renderer = STEP_FLOW[step_index]
 
-    st.markdown(
-        """
-        <div class="hero-banner">
-            <h1>事業計画ウィザード</h1>
-            <p>フレームワークごとの入力を順番にナビゲートし、整合性のとれた経営ストーリーを自動生成します。</p>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.progress((step_index + 1) / total_steps)
+    st.markdown(_HERO_HTML, unsafe_allow_html=True)
+    st.progress((step_index + 1) / TOTAL_STEPS)
     st.caption(f"{step_code}｜{step_title}")
 
     with st.form(f"wizard_form_{step_index}"):
@@ -387,7 +400,7 @@ def run_plan_wizard() -> None:
             "💾 保存",
             use_container_width=True,
         )
-        next_label = "完了" if step_index == total_steps - 1 else "次へ →"
+        next_label = "完了" if step_index == TOTAL_STEPS - 1 else "次へ →"
         next_clicked = col_next.form_submit_button(
             next_label,
             use_container_width=True,
@@ -399,30 +412,30 @@ def run_plan_wizard() -> None:
             for message in errors.values():
                 st.error(message)
             return
-        plan_data[current_section].update(new_values)
-        st.session_state["plan_data"] = plan_data
-        save_encrypted_payload(plan_data)
+        section = plan_data[current_section]
+        # Explicit saves always write; navigation saves only edited steps.
+        if save_clicked or any(section.get(key) != value for key, value in new_values.items()):
+            section.update(new_values)
+            save_encrypted_payload(plan_data)
 
         if back_clicked:
             st.session_state["wizard_step"] = max(0, step_index - 1)
-            st.experimental_rerun()
+            st.rerun()
         elif next_clicked:
-            if step_index == total_steps - 1:
+            if step_index == TOTAL_STEPS - 1:
                 st.success("ウィザード完了。事業計画が更新されました。")
                 st.session_state["wizard_step"] = 0
                 st.session_state["show_wizard"] = False
             else:
-                st.session_state["wizard_step"] = min(total_steps - 1, step_index + 1)
-            st.experimental_rerun()
+                st.session_state["wizard_step"] = min(TOTAL_STEPS - 1, step_index + 1)
+            st.rerun()
         else:
             st.success("保存しました。次のステップへ進む準備が整いました。")
 
     if current_section == "financials":
         financial_inputs = FinancialInputs(**plan_data["financials"])
         try:
-            _, summary = calc_income_statement(financial_inputs)
-            narrative = generate_financial_narrative(financial_inputs, summary)
-            st.info(narrative)
+            st.info(cached_financial_narrative(financial_inputs))
         except ValueError as exc:
             st.warning(str(exc))
 